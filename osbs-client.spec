@@ -90,6 +90,8 @@ Requires:       python3-six
 Requires:       krb5-workstation
 Requires:       python3-PyYAML
 Requires:       git-core
+# fastjsonschema (see requirements.txt) is an optional speedup for
+# container.yaml validation, it is used only when installed
 
 Provides:       python3-osbs = %{version}-%{release}
 Obsoletes:      python3-osbs < %{osbs_obsolete_vr}
@@ -12,18 +12,116 @@ from __future__ import print_function, absolute_import, unicode_literals
 from osbs.exceptions import OsbsException, OsbsValidationException
 from osbs.constants import REPO_CONFIG_FILE, ADDITIONAL_TAGS_FILE, REPO_CONTAINER_CONFIG
 from osbs.utils.labels import Labels
-from osbs.utils.yaml import read_yaml_from_file_path
-from six import StringIO
-from six.moves.configparser import ConfigParser
-from textwrap import dedent
+from osbs.utils.yaml import load_yaml, read_yaml_from_stream
 
+import errno
 import logging
 import os
 import re
+import string
+import threading
 
 
 logger = logging.getLogger(__name__)
 
+# repo.conf syntax as understood by ConfigParser, limited to what is needed
+# for reading the only supported option
+_CONFIG_SECTION_REGEX = re.compile(r'\[(?P<header>.+)\]')
+_CONFIG_ENABLED_REGEX = re.compile(r'enabled\s*[=:]\s*(?P<value>.*)', re.IGNORECASE)
+_CONFIG_BOOLEAN_STATES = {'1': True, 'yes': True, 'true': True, 'on': True,
+                          '0': False, 'no': False, 'false': False, 'off': False}
+
+# shared default for missing container.yaml sections which are only read,
+# must never be modified or exposed
+_EMPTY_DICT = {}
+
+# Labels are never modified once created, instances for identical Dockerfile
+# labels are shared, see _get_labels()
+_labels_cache = {}
+_LABELS_CACHE_SIZE = 256
+
+
+def _open_or_none(path):
+    """
+    Open the file, avoiding a separate existence check
+
+    :param path: str, path to the file
+    :return: file object or None when the file does not exist
+    """
+    try:
+        return open(path)
+    except IOError as e:
+        # ENOTDIR: some parent of the path is not a directory, os.path.exists()
+        # used before reported such file as missing as well
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return None
+        raise
+
+
+def _read_file_or_none(path):
+    """
+    Read the whole file, avoiding a separate existence check
+
+    :param path: str, path to the file
+    :return: str, file content or None when the file does not exist
+    """
+    f = _open_or_none(path)
+    if f is None:
+        return None
+    with f:
+        return f.read()
+
+
+def _get_autorebuild_enabled(config, config_path):
+    """
+    Get the 'enabled' option of the [autorebuild] section
+
+    :param config: str, repo.conf content
+    :param config_path: str, path to repo.conf, used in error messages
+    :return: str, raw option value, 'false' when the option is not set
+    """
+    value = 'false'
+    section = None
+    for lineno, raw_line in enumerate(config.splitlines(), 1):
+        line = raw_line.strip()
+        if not line or line[0] in '#;':
+            continue
+
+        match = _CONFIG_SECTION_REGEX.match(line)
+        if match:
+            section = match.group('header')
+        elif section is None:
+            # ConfigParser refused such files, keep failing the same way
+            from six.moves.configparser import MissingSectionHeaderError
+            raise MissingSectionHeaderError(config_path, lineno, raw_line)
+        elif section == 'autorebuild':
+            match = _CONFIG_ENABLED_REGEX.match(line)
+            if match:
+                value = match.group('value')
+
+    return value
+
+
+def _get_labels(df_labels):
+    """
+    Get Labels for Dockerfile labels, reusing the instance for identical labels
+
+    :param df_labels: dict, labels from the Dockerfile
+    :return: Labels
+    """
+    try:
+        key = frozenset(df_labels.items())
+    except TypeError:
+        # unhashable label values, cannot be cached
+        return Labels(df_labels)
+
+    labels = _labels_cache.get(key)
+    if labels is None:
+        if len(_labels_cache) >= _LABELS_CACHE_SIZE:
+            _labels_cache.clear()
+        labels = _labels_cache[key] = Labels(dict(df_labels))
+    return labels
+
 
 class RepoInfo(object):
     """
@@ -33,11 +131,37 @@ class RepoInfo(object):
     def __init__(self, dockerfile_parser=None, configuration=None, additional_tags=None):
         self.dockerfile_parser = dockerfile_parser
         self.configuration = configuration or RepoConfiguration()
-        self.additional_tags = additional_tags or AdditionalTagsConfig(
-            tags=self.configuration.container.get('tags', set()))
-        self._parsed = False
-        self._base_image = None
-        self._labels = None
+        self._additional_tags = additional_tags
+        # serializes the first parsing of this repository's Dockerfile and tags
+        # file only, other RepoInfo instances are not blocked by a slow read
+        self._parse_lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks cannot be copied or pickled, a new one is created on restore
+        state = self.__dict__.copy()
+        del state['_parse_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parse_lock = threading.Lock()
+
+    @property
+    def additional_tags(self):
+        # default tags config may read the tags file, create it only when needed
+        additional_tags = self._additional_tags
+        if not additional_tags:
+            with self._parse_lock:
+                # another thread may have created it while waiting for the lock
+                additional_tags = self._additional_tags
+                if not additional_tags:
+                    additional_tags = self._additional_tags = AdditionalTagsConfig(
+                        tags=self.configuration.container.get('tags', set()))
+        return additional_tags
+
+    @additional_tags.setter
+    def additional_tags(self, additional_tags):
+        self._additional_tags = additional_tags
 
     @property
     def git_branch(self):
@@ -55,14 +179,23 @@ class RepoInfo(object):
     def git_commit_depth(self):
         return self.configuration.depth
 
-    def _ensure_parsed(self):
-        """Parse the Dockerfile and set self._labels and self._base_image."""
-
-        if self._parsed:
-            return
-
-        self._parsed = True
-
+    def _parse(self):
+        """
+        Parse the Dockerfile, or container.yaml for Flatpaks, only once
+
+        :return: tuple, (Labels, base image)
+        """
+        parsed = self.__dict__.get('_parsed')
+        if parsed is None:
+            with self._parse_lock:
+                # another thread may have parsed it while waiting for the lock
+                parsed = self.__dict__.get('_parsed')
+                if parsed is None:
+                    parsed = self._parsed = self._parse_labels_and_base_image()
+        return parsed
+
+    def _parse_labels_and_base_image(self):
+        """Get labels and base image from the Flatpak config or the Dockerfile"""
         if self.configuration.is_flatpak:
             modules = self.configuration.container_module_specs
 
@@ -78,50 +211,50 @@ class RepoInfo(object):
             name = self.configuration.flatpak_name or module.name
             component = self.configuration.flatpak_component or module.name
 
-            self._labels = Labels({
+            labels = Labels({
                 Labels.LABEL_TYPE_NAME: name,
                 Labels.LABEL_TYPE_COMPONENT: component,
                 Labels.LABEL_TYPE_VERSION: module.stream,
             })
 
-            self._base_image = self.configuration.flatpak_base_image
+            return labels, self.configuration.flatpak_base_image
         else:
             df_parser = self.dockerfile_parser
 
             # DockerfileParse does not ensure a Dockerfile exists during initialization
             try:
-                self._labels = Labels(df_parser.labels)
-                self._base_image = df_parser.baseimage
+                return _get_labels(df_parser.labels), df_parser.baseimage
             except IOError as e:
                 raise RuntimeError('Could not parse Dockerfile in {}: {}'
                                    .format(df_parser.dockerfile_path, e))
 
     @property
     def labels(self):
-        self._ensure_parsed()
-
-        return self._labels
+        return self._parse()[0]
 
     @property
     def base_image(self):
-        self._ensure_parsed()
-
-        return self._base_image
+        return self._parse()[1]
 
 
 class RepoConfiguration(object):
     """
     Read configuration from repository.
+
+    Instances returned by get() are shared, their attributes (e.g. container,
+    autorebuild) must be treated as read-only.
+
+    Validation of container.yaml against its schema may be skipped with
+    validate=False when the file is known to be valid, e.g. it was generated.
     """
 
-    DEFAULT_CONFIG = dedent("""\
-        [autorebuild]
-        enabled = false
-        """)
+    # configurations shared by get(), bounded for long-running processes
+    _instances = {}
+    _instances_lock = threading.Lock()
+    _INSTANCES_CACHE_SIZE = 64
 
     def __init__(self, dir_path='', file_name=REPO_CONFIG_FILE, depth=None,
-                 git_uri=None, git_branch=None, git_ref=None):
-        self._config_parser = ConfigParser()
+                 git_uri=None, git_branch=None, git_ref=None, validate=True):
         self.container = {}
         self.depth = depth or 0
         self.autorebuild = {}
@@ -130,46 +263,94 @@ class RepoConfiguration(object):
         self.git_branch = git_branch
         self.git_ref = git_ref
 
-        # Set default options
-        self._config_parser.readfp(StringIO(self.DEFAULT_CONFIG))   # pylint: disable=W1505; py2
-
         config_path = os.path.join(dir_path, file_name)
-        if os.path.exists(config_path):
-            self._config_parser.read(config_path)
+        try:
+            config = _read_file_or_none(config_path)
+        except (IOError, OSError) as e:
+            # ConfigParser.read() used before skipped unreadable files as well
+            logger.debug('Unable to read %s, ignoring it: %s', config_path, e)
+            config = None
+        # converted to bool only when requested, like ConfigParser.getboolean()
+        self._autorebuild_enabled = _get_autorebuild_enabled(config or '', config_path)
 
         file_path = os.path.join(dir_path, REPO_CONTAINER_CONFIG)
-        if os.path.exists(file_path):
-            try:
-                self.container = read_yaml_from_file_path(file_path, 'schemas/container.json') or {}
-            except Exception as e:
-                msg = ('Failed to load or validate container file "{file}": {reason}'
-                       .format(file=file_path, reason=e))
-                raise OsbsException(msg)
+        try:
+            container_file = _open_or_none(file_path)
+            if container_file is not None:
+                with container_file:
+                    if validate:
+                        self.container = read_yaml_from_stream(container_file,
+                                                               'schemas/container.json') or {}
+                    else:
+                        self.container = load_yaml(container_file) or {}
+        except Exception as e:
+            msg = ('Failed to load or validate container file "{file}": {reason}'
+                   .format(file=file_path, reason=e))
+            raise OsbsException(msg)
 
         # container values may be set to None
-        container_compose = self.container.get('compose') or {}
-        modules = container_compose.get('modules') or []
+        container_compose = self.container.get('compose') or _EMPTY_DICT
+        modules = container_compose.get('modules') or ()
 
         self.autorebuild = self.container.get('autorebuild') or {}
 
         self.container_module_specs = []
         value_errors = []
         for module in modules:
-            try:
-                self.container_module_specs.append(ModuleSpec.from_str(module))
-            except ValueError as e:
-                value_errors.append(e)
+            spec, error = ModuleSpec.try_from_str(module)
+            if error:
+                value_errors.append(ValueError(error))
+            else:
+                self.container_module_specs.append(spec)
         if value_errors:
             raise ValueError(value_errors)
 
-        flatpak = self.container.get('flatpak') or {}
+        flatpak = self.container.get('flatpak') or _EMPTY_DICT
         self.is_flatpak = bool(flatpak)
         self.flatpak_base_image = flatpak.get('base_image')
         self.flatpak_component = flatpak.get('component')
         self.flatpak_name = flatpak.get('name')
 
+    @classmethod
+    def get(cls, dir_path='', file_name=REPO_CONFIG_FILE, depth=None,
+            git_uri=None, git_branch=None, git_ref=None, validate=True):
+        """
+        Return configuration for the repository, reading it only the first
+        time it is requested for the same arguments
+
+        Use clear_cache() when the repository content may have changed.
+        Only callers of get() share instances, RepoConfiguration() always
+        reads the repository.
+        """
+        key = (cls, os.path.abspath(dir_path), file_name, depth,
+               git_uri, git_branch, git_ref, validate)
+        with cls._instances_lock:
+            config = cls._instances.get(key)
+        if config is not None:
+            return config
+
+        # read the repository without holding the lock, at worst it is read
+        # twice by concurrent callers and the first stored instance wins
+        config = cls(dir_path=dir_path, file_name=file_name, depth=depth,
+                     git_uri=git_uri, git_branch=git_branch,
+                     git_ref=git_ref, validate=validate)
+        with cls._instances_lock:
+            if key not in cls._instances and \
+                    len(cls._instances) >= cls._INSTANCES_CACHE_SIZE:
+                cls._instances.clear()
+            return cls._instances.setdefault(key, config)
+
+    @classmethod
+    def clear_cache(cls):
+        """Forget all configurations returned by get()"""
+        with cls._instances_lock:
+            cls._instances.clear()
+
     def is_autorebuild_enabled(self):
-        return self._config_parser.getboolean('autorebuild', 'enabled')
+        try:
+            return _CONFIG_BOOLEAN_STATES[self._autorebuild_enabled.lower()]
+        except KeyError:
+            raise ValueError('Not a boolean: {}'.format(self._autorebuild_enabled))
 
 
 class ModuleSpec(object):
@@ -182,6 +363,10 @@ class ModuleSpec(object):
     supporting partal specifications such as NAME:::CONTEXT.
     """
 
+    SPEC_REGEX = re.compile(r'^(?P<name>[^:/]+):(?P<stream>[^:/]+)'
+                            r'(?::(?P<version>[^:/]+))?(?::(?P<context>[^:/]+))?'
+                            r'(?:/(?P<profile>[^:/]+))?\Z')
+
     def __init__(self, name, stream, version=None, context=None, profile=None):
         self.name = name
         self.stream = stream
@@ -209,20 +394,35 @@ class ModuleSpec(object):
     __hash__ = None     # py2 compatibility
 
     @classmethod
-    def from_str(cls, text):
-        profile = None
-        if '/' in text:
-            module, profile = text.rsplit('/', 1)
-        else:
-            module = text
-
+    def try_from_str(cls, text):
+        """
+        Parse module specification without raising an exception
+
+        :param text: str, NAME:STREAM[:VERSION[:CONTEXT]][/PROFILE]
+        :return: tuple, (ModuleSpec, None) or (None, error message) if invalid
+        """
+        match = cls.SPEC_REGEX.match(text)
+        if match:
+            return cls(**match.groupdict()), None
+
+        # invalid specification, find out why
+        module = text.rsplit('/', 1)[0]
         pieces = module.split(':')
         if not 1 < len(pieces) < 5:
-            raise ValueError('Module specification {} should be in '
-                             'NAME:STREAM[:VERSION[:CONTEXT]][/PROFILE] format'.format(module))
-        if not all(pieces) or profile == '':
-            raise ValueError('Module specification {} contains empty fields'.format(module))
-        return cls(*pieces, profile=profile)
+            return None, ('Module specification {} should be in '
+                          'NAME:STREAM[:VERSION[:CONTEXT]][/PROFILE] format'.format(module))
+        if not all(pieces) or text.endswith('/'):
+            return None, 'Module specification {} contains empty fields'.format(module)
+        # e.g. NAME:STREAM/PRO/FILE or NAME:STREAM/PRO:FILE
+        return None, ("Module specification {} contains ':' or '/' inside a field"
+                      .format(text))
+
+    @classmethod
+    def from_str(cls, text):
+        spec, error = cls.try_from_str(text)
+        if error:
+            raise ValueError(error)
+        return spec
 
 
 class AdditionalTagsConfig(object):
@@ -231,50 +431,74 @@ class AdditionalTagsConfig(object):
     Tags are passed to constructor or are read from repository.
     """
 
-    VALID_TAG_REGEX = re.compile(r'^[\w.]{0,127}$')
+    VALID_TAG_REGEX = re.compile(r'^[\w.]{1,127}\Z')
+    # ASCII subset of VALID_TAG_REGEX characters, for the fast path
+    _ASCII_TAG_CHARS = string.ascii_letters + string.digits + '_.'
 
     def __init__(self, dir_path='', file_name=ADDITIONAL_TAGS_FILE, tags=None):
         tags = tags or set()
         self._tags = set([x for x in tags if self._is_tag_valid(x)])
         self._from_container_yaml = True if tags else False
+        self._file_name = file_name
         self._file_path = os.path.join(dir_path, file_name)
-
-        if os.path.exists(self._file_path):
-            logger.warning('%s file is deprecated and will no longer be '
-                           'supported in a future version. Please consider '
-                           'using tags list in container.yaml instead', file_name)
         self._populate_tags()
+        # tags do not change once populated, build the returned value only once
+        self._sorted_tags = tuple(sorted(self._tags))
+
+    def _warn_deprecated_file(self):
+        logger.warning('%s file is deprecated and will no longer be '
+                       'supported in a future version. Please consider '
+                       'using tags list in container.yaml instead', self._file_name)
 
     def _populate_tags(self):
         if self._from_container_yaml:
+            # tags file is not read, only check whether it is still present
+            if os.path.exists(self._file_path):
+                self._warn_deprecated_file()
             logger.warning('Tags were read from container.yaml file. Additional tags'
                            ' are being ignored!')
             return
 
-        if not os.path.exists(self._file_path):
+        content = _read_file_or_none(self._file_path)
+        if content is None:
             return
 
-        with open(self._file_path) as f:
-            for tag in f:
-                tag = tag.strip()
-                if not self._is_tag_valid(tag):
-                    continue
-                self._tags.add(tag)
+        self._warn_deprecated_file()
+        # split on newlines only, str.splitlines() also breaks lines on
+        # other separators, e.g. '\x0c', which are invalid in a tag
+        tags = {tag.strip() for tag in content.split('\n')}
+        # blank lines are not tags, skip them without a warning
+        tags.discard('')
+        valid_tags = {tag for tag in tags if self._tag_matches(tag)}
+        self._tags |= valid_tags
 
-    def _is_tag_valid(self, tag):
-        if not tag:
-            return False
+        if logger.isEnabledFor(logging.WARNING):
+            for tag in sorted(tags - valid_tags):
+                self._warn_invalid_tag(tag)
+
+    def _tag_matches(self, tag):
+        # nothing left after stripping the allowed characters means the tag
+        # matches VALID_TAG_REGEX, regex is needed only for non-ASCII tags
+        if 0 < len(tag) <= 127 and not tag.strip(self._ASCII_TAG_CHARS):
+            return True
 
-        if not self.VALID_TAG_REGEX.match(tag):
-            logger.warning('Invalid additional tag "%s", must match pattern %s',
-                           tag, self.VALID_TAG_REGEX.pattern)
+        return bool(self.VALID_TAG_REGEX.match(tag))
+
+    def _warn_invalid_tag(self, tag):
+        logger.warning('Invalid additional tag "%s", must match pattern %s',
+                       tag, self.VALID_TAG_REGEX.pattern)
+
+    def _is_tag_valid(self, tag):
+        if not self._tag_matches(tag):
+            self._warn_invalid_tag(tag)
             return False
 
         return True
 
     @property
     def tags(self):
-        return list(self._tags)
+        """Sorted tuple of valid tags"""
+        return self._sorted_tags
 
     @property
     def from_container_yaml(self):
@@ -9,28 +9,35 @@ of the BSD license. See the LICENSE file for details.
 
 from __future__ import absolute_import, unicode_literals
 
-from pkg_resources import resource_stream
 from osbs.exceptions import OsbsValidationException
 
-import codecs
 import json
-import jsonschema
 import logging
-import yaml
+
+# yaml, jsonschema and fastjsonschema are slow to import and
+# only needed when YAML is actually read, they are imported on first use
 
 
 logger = logging.getLogger(__name__)
 
+DRAFT4_SCHEMA_URI = 'http://json-schema.org/draft-04/schema#'
+
+# Validators for the JSON schemas, keyed by (package, schema path). Schemas
+# are shipped with the package and never change at runtime, so each one is
+# loaded and checked against the meta-schema only once per process.
+_validators = {}
+# fastjsonschema compiled validation functions, same keys as _validators
+_compiled_validators = {}
+
 
 def read_yaml_from_file_path(file_path, schema, package=None):
     """
-    :param yaml_data: string, yaml content
+    :param file_path: string, path to the yaml file
     :param schema: string, file path to the JSON schema
     :package: string, package name containing the schema
     """
     with open(file_path) as f:
-        yaml_data = f.read()
-    return read_yaml(yaml_data, schema, package)
+        return read_yaml_from_stream(f, schema, package)
 
 
 def read_yaml(yaml_data, schema, package=None):
@@ -39,10 +46,75 @@ def read_yaml(yaml_data, schema, package=None):
     :param schema: string, file path to the JSON schema
     :package: string, package name containing the schema
     """
+    return read_yaml_from_stream(yaml_data, schema, package)
+
+
+def read_yaml_from_stream(stream, schema, package=None):
+    """
+    :param stream: file object or string, yaml content
+    :param schema: string, file path to the JSON schema
+    :package: string, package name containing the schema
+    """
     package = package or 'osbs'
+    validator = _get_validator(schema, package)
+    data = load_yaml(stream)
+
+    compiled_validator = _compiled_validators.get((package, schema))
+    if compiled_validator is not None:
+        from fastjsonschema import JsonSchemaException
+
+        try:
+            compiled_validator(data)
+            return data
+        except JsonSchemaException:
+            # jsonschema provides the detailed error report
+            pass
+
+    errors = list(validator.iter_errors(data))
+    if errors:
+        # formatting every error is only worth it when it gets logged
+        if logger.isEnabledFor(logging.DEBUG):
+            # first error is the one validator.validate() would have raised
+            logger.debug("schema validation error: %s", errors[0])
+
+            for error in errors:
+                error_message = get_error_message(error)
+
+                logger.debug("validation error: %s", error_message)
+
+        raise OsbsValidationException(get_error_message(errors[0]))
+
+    return data
+
+
+def load_yaml(stream):
+    """
+    Load yaml without validating it, for trusted content only
+
+    :param stream: file object or string, yaml content
+    """
+    import yaml
+
+    # libyaml based loader is considerably faster, use it when available
+    return yaml.load(stream, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+def _get_validator(schema, package):
+    """
+    Load the JSON schema and return a (cached) validator for it
+
+    :param schema: string, file path to the JSON schema
+    :package: string, package name containing the schema
+    :return: jsonschema.Draft4Validator
+    """
+    key = (package, schema)
+    if key in _validators:
+        return _validators[key]
+
+    import jsonschema
+
     try:
-        resource = resource_stream(package, schema)
-        schema = codecs.getreader('utf-8')(resource)
+        schema_data = _read_resource(package, schema)
     except (ImportError):
         logger.error('Unable to find package %s', package)
         raise
@@ -51,38 +123,67 @@ def read_yaml(yaml_data, schema, package=None):
         raise
 
     try:
-        schema = json.load(schema)
+        # json decodes UTF-8 encoded bytes on its own
+        schema_json = json.loads(schema_data)
     except ValueError:
         logger.error('unable to decode JSON schema, cannot validate')
         raise
-    data = yaml.safe_load(yaml_data)
-    validator = jsonschema.Draft4Validator(schema=schema)
+
     try:
-        jsonschema.Draft4Validator.check_schema(schema)
-        validator.validate(data)
+        jsonschema.Draft4Validator.check_schema(schema_json)
     except jsonschema.SchemaError:
         logger.error('invalid schema, cannot validate')
         raise
-    except jsonschema.ValidationError as exc:
-        logger.debug("schema validation error: %s", exc)
 
-        exc_message = get_error_message(exc)
+    validator = jsonschema.Draft4Validator(schema=schema_json)
+    _validators[key] = validator
 
-        for error in validator.iter_errors(data):
-            error_message = get_error_message(error)
+    try:
+        # validation code generated by fastjsonschema is much faster than
+        # jsonschema, use it when available to check valid documents
+        import fastjsonschema
+    except ImportError:
+        return validator
+
+    # fastjsonschema picks the draft from $schema, while the data is always
+    # validated as draft 4 by jsonschema; later drafts accept more documents
+    # (e.g. 1.0 as an integer), which must not pass the fast path
+    draft4_schema = dict(schema_json)
+    draft4_schema['$schema'] = DRAFT4_SCHEMA_URI
 
-            logger.debug("validation error: %s", error_message)
+    try:
+        # do not fill in defaults, data must be returned as loaded
+        _compiled_validators[key] = fastjsonschema.compile(draft4_schema, use_default=False)
+    except fastjsonschema.JsonSchemaDefinitionException as exc:
+        logger.debug('unable to compile JSON schema %s: %s', schema, exc)
 
-        raise OsbsValidationException(exc_message)
+    return validator
 
-    return data
+
+def _read_resource(package, path):
+    """
+    :param package: string, package name containing the resource
+    :param path: string, resource path relative to the package
+    :return: bytes, resource content
+    """
+    try:
+        from importlib.resources import files
+    except ImportError:
+        # Python < 3.9, pkg_resources is much slower to import and look up
+        from pkg_resources import resource_string
+        return resource_string(package, path)
+
+    return files(package).joinpath(path).read_bytes()
 
 
 def get_error_message(error):
-    path = "".join(
-        ('[{}]' if isinstance(element, int) else '.{}').format(element)
-        for element in error.path
-    )
+    path_parts = []
+    for element in error.path:
+        if isinstance(element, int):
+            path_parts.append('[{}]'.format(element))
+        else:
+            path_parts.append('.{}'.format(element))
+    path = "".join(path_parts)
 
     # receive all context messages without duplicates caused by the validator 'anyOf'
     error_contexts = set()
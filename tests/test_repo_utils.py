@@ -12,22 +12,57 @@ from flexmock import flexmock
 from osbs.exceptions import OsbsException, OsbsValidationException
 from osbs.constants import REPO_CONFIG_FILE, ADDITIONAL_TAGS_FILE, REPO_CONTAINER_CONFIG
 from osbs.utils.labels import Labels
+from osbs import repo_utils
 from osbs.repo_utils import RepoInfo, RepoConfiguration, AdditionalTagsConfig, ModuleSpec
+from six.moves.configparser import MissingSectionHeaderError
 from textwrap import dedent
 
+import copy
 import os
+import pickle
 import pytest
+import re
+import threading
+import time
 import yaml
 
 
+def test_read_file_or_none(tmpdir):
+    file_path = tmpdir.join('file')
+    assert repo_utils._read_file_or_none(str(file_path)) is None
+
+    file_path.write('content')
+    assert repo_utils._read_file_or_none(str(file_path)) == 'content'
+
+    # parent is a regular file, not a directory
+    assert repo_utils._read_file_or_none(os.path.join(str(file_path), 'file')) is None
+
+    with pytest.raises(EnvironmentError):
+        repo_utils._read_file_or_none(str(tmpdir))
+
+
 class TestRepoInfo(object):
 
     def test_default_params(self):
         repo_info = RepoInfo()
         assert repo_info.dockerfile_parser is None
         assert isinstance(repo_info.configuration, RepoConfiguration)
+        # default configuration is not shared
+        assert RepoInfo().configuration is not repo_info.configuration
         assert isinstance(repo_info.additional_tags, AdditionalTagsConfig)
 
+    def test_additional_tags_lazy(self):
+        repo_info = RepoInfo()
+        tags_config = AdditionalTagsConfig()
+
+        (flexmock(repo_utils)
+            .should_receive('AdditionalTagsConfig')
+            .and_return(tags_config)
+            .once())
+        assert repo_info.git_uri is None
+        assert repo_info.additional_tags is tags_config
+        assert repo_info.additional_tags is tags_config
+
     def test_explicit_params(self):
         df_parser = flexmock()
         configuration = RepoConfiguration()
@@ -75,6 +110,77 @@ class TestRepoInfo(object):
             assert value == 'image1'
             assert repo_info.base_image == 'fedora:latest'
 
+    def test_dockerfile_parsed_once(self):
+        class MockParser(object):
+            calls = 0
+
+            @property
+            def labels(self):
+                MockParser.calls += 1
+                return {'name': 'image1'}
+
+            baseimage = 'fedora:latest'
+
+        repo_info = RepoInfo(MockParser())
+        labels = repo_info.labels
+        assert repo_info.labels is labels
+        assert repo_info.base_image == 'fedora:latest'
+        assert MockParser.calls == 1
+
+    def test_labels_shared(self):
+        class MockParser(object):
+            def __init__(self, labels):
+                self.labels = labels
+
+            baseimage = 'fedora:latest'
+
+        labels = RepoInfo(MockParser({'name': 'image1'})).labels
+        assert RepoInfo(MockParser({'name': 'image1'})).labels is labels
+        assert RepoInfo(MockParser({'name': 'image2'})).labels is not labels
+
+        # unhashable values are not cached
+        unhashable = RepoInfo(MockParser({'name': ['image1']})).labels
+        _, value = unhashable.get_name_and_value(Labels.LABEL_TYPE_NAME)
+        assert value == ['image1']
+        assert RepoInfo(MockParser({'name': ['image1']})).labels is not unhashable
+
+    def test_copy(self):
+        repo_info = RepoInfo(additional_tags=AdditionalTagsConfig(tags=['latest']))
+
+        for copied in (copy.copy(repo_info), copy.deepcopy(repo_info),
+                       pickle.loads(pickle.dumps(repo_info))):
+            assert copied.additional_tags.tags == ('latest',)
+            assert copied._parse_lock is not repo_info._parse_lock
+            # the new lock is usable
+            with copied._parse_lock:
+                pass
+
+    def test_additional_tags_created_once(self):
+        repo_info = RepoInfo()
+        calls = []
+
+        def create_tags_config(tags):
+            calls.append(tags)
+            # give other threads a chance to get past the first check
+            time.sleep(0.05)
+            return AdditionalTagsConfig(tags=tags)
+
+        (flexmock(repo_utils)
+            .should_receive('AdditionalTagsConfig')
+            .replace_with(create_tags_config))
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(repo_info.additional_tags))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert len(results) == 5
+        assert all(result is results[0] for result in results)
+
     @pytest.mark.parametrize('modules,name,component,expected_name,expected_component', (
         (None, None, None, None, None),
         ([], None, None, None, None),
@@ -144,6 +250,28 @@ class TestRepoConfiguration(object):
         conf = RepoConfiguration()
         assert conf.is_autorebuild_enabled() is False
 
+    def test_get_cached(self, tmpdir):
+        RepoConfiguration.clear_cache()
+        conf = RepoConfiguration.get(dir_path=str(tmpdir))
+        assert isinstance(conf, RepoConfiguration)
+        assert RepoConfiguration.get(dir_path=str(tmpdir)) is conf
+        assert RepoConfiguration.get(dir_path=str(tmpdir), git_ref='abc') is not conf
+
+        RepoConfiguration.clear_cache()
+        assert RepoConfiguration.get(dir_path=str(tmpdir)) is not conf
+
+    def test_get_cache_bounded(self, tmpdir):
+        RepoConfiguration.clear_cache()
+        first = RepoConfiguration.get(dir_path=str(tmpdir), git_ref='0')
+        for i in range(1, RepoConfiguration._INSTANCES_CACHE_SIZE):
+            RepoConfiguration.get(dir_path=str(tmpdir), git_ref=str(i))
+        assert len(RepoConfiguration._instances) == RepoConfiguration._INSTANCES_CACHE_SIZE
+        assert RepoConfiguration.get(dir_path=str(tmpdir), git_ref='0') is first
+
+        RepoConfiguration.get(dir_path=str(tmpdir), git_ref='new')
+        assert len(RepoConfiguration._instances) == 1
+        RepoConfiguration.clear_cache()
+
     def test_invalid_yaml(self, tmpdir):
         yaml_file = tmpdir.join(REPO_CONTAINER_CONFIG)
         yaml_file.write('\n'.join(['hallo: 1', 'bye']))
@@ -154,7 +282,11 @@ class TestRepoConfiguration(object):
         err_msg = str(exc_info.value)
         assert 'Failed to load or validate container file "{}"'.format(yaml_file) in err_msg
         assert "could not find expected ':'" in err_msg
-        assert 'line 2, column 4:' in err_msg
+        # libyaml reports the position where scanning stopped
+        if yaml.__with_libyaml__:
+            assert 'line 3, column 1' in err_msg
+        else:
+            assert 'line 2, column 4:' in err_msg
 
     @pytest.mark.parametrize(('config_value', 'expected_value'), (
         (None, False),
@@ -189,6 +321,73 @@ class TestRepoConfiguration(object):
         else:
             assert conf.autorebuild == {}
 
+    @pytest.mark.parametrize(('config', 'expected_value'), (
+        ('', False),
+        ('[autorebuild]\nenabled = yes\n', True),
+        ('[autorebuild]\nEnabled: On\n', True),
+        ('[autorebuild]\n# enabled = true\nenabled = 0\n', False),
+        ('[other]\nenabled = true\n[autorebuild]\n', False),
+        ('[autorebuild]\nenabled = true\n[other]\nenabled = false\n', True),
+    ))
+    def test_autorebuild_config_syntax(self, tmpdir, config, expected_value):
+        with open(os.path.join(str(tmpdir), REPO_CONFIG_FILE), 'w') as f:
+            f.write(config)
+
+        conf = RepoConfiguration(dir_path=str(tmpdir))
+        assert conf.is_autorebuild_enabled() is expected_value
+
+    def test_dir_path_is_file(self, tmpdir):
+        dir_path = tmpdir.join('file')
+        dir_path.write('content')
+
+        conf = RepoConfiguration(dir_path=str(dir_path))
+        assert conf.container == {}
+        assert conf.is_autorebuild_enabled() is False
+
+    def test_unreadable_config(self, tmpdir):
+        # a directory cannot be read as a file
+        tmpdir.mkdir(REPO_CONFIG_FILE)
+
+        conf = RepoConfiguration(dir_path=str(tmpdir))
+        assert conf.is_autorebuild_enabled() is False
+
+    def test_unreadable_container_yaml(self, tmpdir):
+        tmpdir.mkdir(REPO_CONTAINER_CONFIG)
+
+        with pytest.raises(OsbsException, match='Failed to load or validate container file'):
+            RepoConfiguration(dir_path=str(tmpdir))
+
+    def test_autorebuild_config_missing_section(self, tmpdir):
+        with open(os.path.join(str(tmpdir), REPO_CONFIG_FILE), 'w') as f:
+            f.write('# comment\n\nenabled = true\n[autorebuild]\n')
+
+        with pytest.raises(MissingSectionHeaderError) as exc_info:
+            RepoConfiguration(dir_path=str(tmpdir))
+        assert exc_info.value.lineno == 3
+
+    def test_autorebuild_config_invalid_value(self, tmpdir):
+        with open(os.path.join(str(tmpdir), REPO_CONFIG_FILE), 'w') as f:
+            f.write('[autorebuild]\nenabled = sometimes\n')
+
+        conf = RepoConfiguration(dir_path=str(tmpdir))
+        with pytest.raises(ValueError, match='Not a boolean: sometimes'):
+            conf.is_autorebuild_enabled()
+
+    @pytest.mark.parametrize('validate', (True, False))
+    def test_validate(self, tmpdir, validate):
+        with open(os.path.join(str(tmpdir), REPO_CONTAINER_CONFIG), 'w') as f:
+            f.write(dedent("""\
+                tags:
+                - 1.14
+                """))
+
+        if validate:
+            with pytest.raises(OsbsException, match="is not of type u?'string'"):
+                RepoConfiguration(dir_path=str(tmpdir), validate=validate)
+        else:
+            conf = RepoConfiguration(dir_path=str(tmpdir), validate=validate)
+            assert conf.container == {'tags': [1.14]}
+
     @pytest.mark.parametrize('module_a_nsv, module_b_nsv, should_raise', [
         ('name:stream', 'name', True),
         ('name', 'name:stream', True),
@@ -355,28 +554,91 @@ class TestModuleSpec(object):
         assert spec.to_str() == as_str
         assert spec.to_str(include_profile=False) == as_str_no_profile
 
+    @pytest.mark.parametrize(('as_str', 'expected'), [
+        ('a:b', ModuleSpec('a', 'b')),
+        ('a:b:c:d/p', ModuleSpec('a', 'b', 'c', 'd', 'p')),
+        ('a:b/p', ModuleSpec('a', 'b', profile='p')),
+    ])
+    def test_module_spec_from_str(self, as_str, expected):
+        assert ModuleSpec.from_str(as_str) == expected
+        assert ModuleSpec.try_from_str(as_str) == (expected, None)
+
+    @pytest.mark.parametrize(('as_str', 'message'), [
+        ('a', 'should be in NAME:STREAM[:VERSION[:CONTEXT]][/PROFILE] format'),
+        ('a:b:c:d:e', 'should be in NAME:STREAM[:VERSION[:CONTEXT]][/PROFILE] format'),
+        ('a/p', 'should be in NAME:STREAM[:VERSION[:CONTEXT]][/PROFILE] format'),
+        ('a::c', 'contains empty fields'),
+        (':b', 'contains empty fields'),
+        ('a:b/', 'contains empty fields'),
+        ('a:b/p:x', "Module specification a:b/p:x contains ':' or '/' inside a field"),
+        ('a:b/c/d', "Module specification a:b/c/d contains ':' or '/' inside a field"),
+    ])
+    def test_module_spec_from_str_invalid(self, as_str, message):
+        with pytest.raises(ValueError, match=re.escape(message)):
+            ModuleSpec.from_str(as_str)
+
+        spec, error = ModuleSpec.try_from_str(as_str)
+        assert spec is None
+        assert message in error
+
 
 class TestAdditionalTagsConfig(object):
 
     def test_default_values(self):
         conf = AdditionalTagsConfig()
-        assert conf.tags == []
+        assert conf.tags == ()
 
     def test_tags_parsed(self, tmpdir):
         tags = ['spam', 'bacon', 'eggs', 'saus.age']
         self.mock_additional_tags(str(tmpdir), tags)
         conf = AdditionalTagsConfig(dir_path=str(tmpdir))
-        # Compare as a "set" because order is not guaranteed
-        assert set(conf.tags) == set(tags)
+        assert conf.tags == tuple(sorted(tags))
 
     @pytest.mark.parametrize('bad_tag', [
         '{bad', 'bad}', '{bad}', 'ba-d', '-bad', 'bad-', 'b@d',
     ])
-    def test_invalid_tags(self, tmpdir, bad_tag):
+    def test_invalid_tags(self, tmpdir, caplog, bad_tag):
         tags = [bad_tag, 'good']
         self.mock_additional_tags(str(tmpdir), tags)
         conf = AdditionalTagsConfig(dir_path=str(tmpdir))
-        assert conf.tags == ['good']
+        assert conf.tags == ('good',)
+        assert 'Invalid additional tag "{}"'.format(bad_tag) in caplog.text
+
+    @pytest.mark.parametrize(('tag', 'valid'), [
+        ('latest', True),
+        ('1.14', True),
+        ('v1_2.3', True),
+        ('a' * 127, True),
+        ('a' * 128, False),
+        (u'ta\u0161ka', True),
+        ('ta-g', False),
+        ('', False),
+    ])
+    def test_tag_validation(self, tag, valid):
+        conf = AdditionalTagsConfig(tags=[tag])
+        assert conf.tags == ((tag,) if valid else ())
+
+    def test_dir_path_is_file(self, tmpdir):
+        dir_path = tmpdir.join('file')
+        dir_path.write('content')
+
+        conf = AdditionalTagsConfig(dir_path=str(dir_path))
+        assert conf.tags == ()
+
+    def test_blank_and_long_tags(self, tmpdir, caplog):
+        tags = ['', 'good', '  ', 'a' * 127, 'b' * 128]
+        self.mock_additional_tags(str(tmpdir), tags)
+        conf = AdditionalTagsConfig(dir_path=str(tmpdir))
+        assert conf.tags == ('a' * 127, 'good')
+        assert caplog.text.count('Invalid additional tag') == 1
+
+    @pytest.mark.parametrize('separator', ['\x0b', '\x0c', '\x1c', '\x1d', '\x1e'])
+    def test_tags_split_on_newlines_only(self, tmpdir, caplog, separator):
+        bad_tag = 'foo{}bar'.format(separator)
+        self.mock_additional_tags(str(tmpdir), [bad_tag, 'good'])
+        conf = AdditionalTagsConfig(dir_path=str(tmpdir))
+        assert conf.tags == ('good',)
+        assert caplog.text.count('Invalid additional tag') == 1
 
     def mock_additional_tags(self, dir_path, tags=None):
         contents = ''
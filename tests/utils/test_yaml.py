@@ -9,23 +9,35 @@ of the BSD license. See the LICENSE file for details.
 from __future__ import absolute_import
 
 from flexmock import flexmock
-from osbs.utils.yaml import read_yaml, read_yaml_from_file_path
+from osbs.utils import yaml as osbs_yaml
+from osbs.utils.yaml import (load_yaml, read_yaml, read_yaml_from_file_path,
+                             read_yaml_from_stream)
 from osbs.exceptions import OsbsValidationException
+from six import StringIO
 
 import json
 import os
-import pkg_resources
 import pytest
+import sys
 import yaml
 
 
+@pytest.fixture
+def clear_validators():
+    osbs_yaml._validators.clear()
+    osbs_yaml._compiled_validators.clear()
+    yield
+    osbs_yaml._validators.clear()
+    osbs_yaml._compiled_validators.clear()
+
+
 def test_read_yaml_file_ioerrors(tmpdir):
     config_path = os.path.join(str(tmpdir), 'nosuchfile.yaml')
     with pytest.raises(IOError):
         read_yaml_from_file_path(config_path, 'schemas/nosuchfile.json')
 
 
-@pytest.mark.parametrize('from_file', [True, False])
+@pytest.mark.parametrize('source', ['file', 'stream', 'string'])
 @pytest.mark.parametrize('config', [
     ("""\
       compose:
@@ -33,36 +45,76 @@ def test_read_yaml_file_ioerrors(tmpdir):
           - mod_name:mod_stream:mod_version
     """),
 ])
-def test_read_yaml_file_or_yaml(tmpdir, from_file, config):
+def test_read_yaml_file_or_yaml(tmpdir, source, config):
     expected = yaml.safe_load(config)
 
-    if from_file:
+    if source == 'file':
         config_path = os.path.join(str(tmpdir), 'config.yaml')
         with open(config_path, 'w') as fp:
             fp.write(config)
         output = read_yaml_from_file_path(config_path, 'schemas/container.json')
+    elif source == 'stream':
+        output = read_yaml_from_stream(StringIO(config), 'schemas/container.json')
     else:
         output = read_yaml(config, 'schemas/container.json')
 
     assert output == expected
 
 
+@pytest.mark.parametrize('has_fastjsonschema', [True, False])
+def test_read_yaml_compiled_validator(monkeypatch, clear_validators, has_fastjsonschema):
+    if not has_fastjsonschema:
+        monkeypatch.setitem(sys.modules, 'fastjsonschema', None)
+
+    config = "tags: [latest]"
+    assert read_yaml(config, 'schemas/container.json') == {'tags': ['latest']}
+    key = ('osbs', 'schemas/container.json')
+    assert (key in osbs_yaml._compiled_validators) == has_fastjsonschema
+
+    with pytest.raises(OsbsValidationException):
+        read_yaml("tags: [1.14]", 'schemas/container.json')
+
+    # container.json declares draft 6, where 1.0 is an integer, but it is
+    # validated as draft 4 and the compiled validator must agree
+    with pytest.raises(OsbsValidationException, match="is not of type u?'integer'"):
+        read_yaml("version: 1.0", 'schemas/container.json')
+
+
+def test_load_yaml_not_validated():
+    (flexmock(osbs_yaml)
+        .should_receive('_get_validator')
+        .never())
+    assert load_yaml("tags: [1.14]") == {'tags': [1.14]}
+    assert load_yaml(StringIO("tags: [1.14]")) == {'tags': [1.14]}
+
+
 def test_read_yaml_bad_package(caplog):
     with pytest.raises(ImportError):
         read_yaml("", 'schemas/container.json', package='bad_package')
     assert 'Unable to find package bad_package' in caplog.text
 
 
-def test_read_yaml_file_bad_extract(tmpdir, caplog):
-    class FakeProvider(object):
-        def get_resource_stream(self, pkg, rsc):
-            raise IOError
+def test_read_yaml_validator_cached():
+    read_yaml("", 'schemas/container.json')
+    validator = osbs_yaml._validators[('osbs', 'schemas/container.json')]
+
+    (flexmock(osbs_yaml)
+        .should_receive('_read_resource')
+        .never())
+    read_yaml("", 'schemas/container.json')
+    assert osbs_yaml._validators[('osbs', 'schemas/container.json')] is validator
+
+
+def test_read_yaml_missing_schema(caplog, clear_validators):
+    with pytest.raises(IOError):
+        read_yaml("", 'schemas/nosuchfile.json')
+    assert "unable to extract JSON schema, cannot validate" in caplog.text
+
 
-    # pkg_resources.resource_stream() cannot be mocked directly
-    # Instead mock the module-level function it calls.
-    (flexmock(pkg_resources)
-        .should_receive('get_provider')
-        .and_return(FakeProvider()))
+def test_read_yaml_file_bad_extract(tmpdir, caplog, clear_validators):
+    (flexmock(osbs_yaml)
+        .should_receive('_read_resource')
+        .and_raise(IOError))
 
     config_path = os.path.join(str(tmpdir), 'config.yaml')
     with open(config_path, 'w'):
@@ -73,9 +125,9 @@ def test_read_yaml_file_bad_extract(tmpdir, caplog):
     assert "unable to extract JSON schema, cannot validate" in caplog.text
 
 
-def test_read_yaml_file_bad_decode(tmpdir, caplog):
+def test_read_yaml_file_bad_decode(tmpdir, caplog, clear_validators):
     (flexmock(json)
-        .should_receive('load')
+        .should_receive('loads')
         .and_raise(ValueError))
 
     config_path = os.path.join(str(tmpdir), 'config.yaml')